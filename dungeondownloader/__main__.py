@@ -1,3 +1,4 @@
+import functools
 import logging
 import os
 
@@ -6,12 +7,24 @@ from dotenv import load_dotenv
 import dungeondownloader.cli
 
 
+@functools.lru_cache(maxsize=1)
+def _load_env_once() -> bool:
+    """Load the .env file at most once per process.
+    """
+    return load_dotenv()
+
+
 def set_loglevel() -> None:
     """
     Set the log level based on the DUNGEONDOWNLOADER_LOGLEVEL env
     variable. Supports a .env file and defaults to 'INFO'.
+
+    The .env lookup walks the filesystem, so it is skipped when the
+    variable is already exported and cached across repeat calls
+    otherwise.
     """
-    load_dotenv()
+    if "DUNGEONDOWNLOADER_LOGLEVEL" not in os.environ:
+        _load_env_once()
     logging.basicConfig(
         format='%(levelname)s:%(message)s',
         level=getattr(
@@ -1,7 +1,6 @@
 import argparse as ap
 import logging
 
-import dungeondownloader.savewrapper
 from dungeondownloader._version import __version__
 
 
@@ -39,6 +38,13 @@ def main() -> None:
         help="Whether to recalculate the hashes of all files instead "
              "of using the cached hashes from the last run.",
     )
+    parser.add_argument(
+        "-w", "--max-workers",
+        type=int,
+        help="Number of concurrent download connections to use. "
+             "Defaults to 16.",
+        required=False
+    )
     parser.add_argument(
         "-d", "--delete-files",
         action="store_true",
@@ -46,10 +52,12 @@ def main() -> None:
              "are no longer present in the latest patch list. Will ask for "
              "confirmation if the number of files to delete is high."
     )
-    parser.set_defaults(func=dungeondownloader.savewrapper.main)
     args = parser.parse_args()
     logging.info(f"Running dungeon downloader version "
                  f"{__version__}")
     logging.info("This is a fan made program and uses an undocumented API, "
                  "use at your own risk")
-    args.func(**vars(args))
+    # Imported only once we know we're actually running, so --help and
+    # --version don't pay for requests/pydantic/tqdm imports.
+    import dungeondownloader.savewrapper
+    dungeondownloader.savewrapper.main(**vars(args))
@@ -1,6 +1,15 @@
 from typing import TypedDict
 
-from dungeondownloader.hashing import HashDict
+
+class ConfigHashEntry(TypedDict, total=True):
+    """
+    On-disk form of a hash cache entry. Mirrors
+    dungeondownloader.hashing.HashEntry, except the digest is stored
+    as a hex string for readability.
+    """
+    sha: str
+    size: int
+    mtime_ns: int
 
 
 class ConfigDictRequired(TypedDict, total=True):
@@ -13,4 +22,4 @@ class ConfigDictRequired(TypedDict, total=True):
 class ConfigDict(ConfigDictRequired, total=False):
     """Optional config keys.
     """
-    hashes: HashDict
+    hashes: dict[str, ConfigHashEntry]
@@ -1,20 +1,54 @@
 from __future__ import annotations
 
+import hashlib
 import logging
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from multiprocessing.dummy import Pool as ThreadPool
 from pathlib import Path
-from typing import Optional, TypeVar
+from typing import BinaryIO, Iterable, Iterator, Optional, TypeVar
+from urllib.request import url2pathname
 
 import requests
+from requests.adapters import HTTPAdapter, Retry
 from tqdm import tqdm
 
-from dungeondownloader.hashing import Hashing, HashDict
+from dungeondownloader.hashing import HashDict, HashEntryDict, default_hasher
 from dungeondownloader.patch_file import PatchFileList, PatchFile
 
 _T = TypeVar("_T")
 
+# Number of concurrent downloads. Patch lists tend to contain many
+# small files, so the sweet spot is well above the CPU count.
+_DOWNLOAD_WORKERS = 16
+
+# Files at least this big are fetched as parallel byte ranges, since a
+# single connection rarely saturates the link on its own.
+_RANGE_MIN_SIZE = 16 << 20
+_RANGE_PARTS = 4
+
+
+def _make_session() -> requests.Session:
+    """
+    Build the session shared by all HTTP calls in this module. Keeping
+    one session means the download threads reuse pooled keep-alive
+    connections instead of paying a TCP+TLS handshake per file.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=_DOWNLOAD_WORKERS,
+        pool_maxsize=_DOWNLOAD_WORKERS,
+        max_retries=Retry(total=3, backoff_factor=0.2)
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_SESSION = _make_session()
+
 
 def confirm(question: str,
             default: Optional[bool] = None) -> bool:
@@ -39,78 +73,353 @@ def confirm(question: str,
             print("Please respond with 'yes' or 'no' (or 'y'/'n').\n")
 
 
+class _ProgressWriter:
+    """
+    File-like wrapper that forwards writes to the underlying file
+    while counting written bytes into a shared tqdm bar and, when a
+    hasher is given, feeding them into it. Hashing the bytes as they
+    stream past means the file never has to be read back from disk
+    just to verify it.
+
+    Progress updates are accumulated locally and flushed once per MiB
+    because the bar is shared between download threads and every
+    update takes its lock.
+    """
+    def __init__(self,
+                 f: BinaryIO,
+                 pbar: tqdm[_T],
+                 hasher: Optional["hashlib._Hash"] = None) -> None:
+        self._f = f
+        self._pbar = pbar
+        self._hasher = hasher
+        self._pending = 0
+
+    def write(self, data: bytes) -> int:
+        size = self._f.write(data)
+        if self._hasher is not None:
+            self._hasher.update(data)
+        self._pending += size
+        if self._pending >= 1 << 20:
+            self._pbar.update(self._pending)
+            self._pending = 0
+        return size
+
+    def flush_progress(self) -> None:
+        """Push any remaining byte count to the progress bar.
+        """
+        if self._pending:
+            self._pbar.update(self._pending)
+            self._pending = 0
+
+
+def _fetch_range(byte_range: tuple[int, int],
+                 url: str,
+                 fd: int,
+                 pbar: tqdm[_T]) -> bool:
+    """
+    Fetch one byte range of a file and write it at its offset with
+    pwrite, which needs no shared file position and therefore no lock
+    between the range workers.
+
+    Returns
+    -------
+    ok : False if the server answered with something other than 206,
+        meaning it ignored the Range header
+    """
+    start, stop = byte_range
+    # The range math and pwrite offsets are in encoded-body bytes, so
+    # any content coding would corrupt the reassembly; ask for the
+    # identity representation and bail out if the server applies one
+    # anyway.
+    r = _SESSION.get(
+        url, stream=True,
+        headers={"Range": f"bytes={start}-{stop}",
+                 "Accept-Encoding": "identity",
+                 "Cache-Control": "no-cache"}
+    )
+    if r.status_code != 206 or "Content-Encoding" in r.headers:
+        return False
+    offset = start
+    for chunk in r.iter_content(chunk_size=1 << 20):
+        os.pwrite(fd, chunk, offset)
+        offset += len(chunk)
+        pbar.update(len(chunk))
+    return True
+
+
+def _download_ranged(url: str,
+                     filepath: str,
+                     pbar: tqdm[_T],
+                     size: int) -> bool:
+    """
+    Download a large file as several parallel byte ranges into a
+    preallocated destination.
+
+    Returns
+    -------
+    ok : whether the ranged download succeeded; on False the caller
+        should fall back to a plain single-stream download
+    """
+    # os.pwrite doesn't exist on Windows; without it the range workers
+    # have no way to write at their offsets, so large files go through
+    # the single stream there.
+    if not hasattr(os, "pwrite"):
+        return False
+    # A content coding on the probe means the byte ranges wouldn't
+    # line up with the file's bytes; let the single-stream path, which
+    # decodes correctly, handle it instead.
+    head = _SESSION.head(url, allow_redirects=True,
+                         headers={"Accept-Encoding": "identity"})
+    if (head.headers.get("Accept-Ranges") != "bytes"
+            or "Content-Encoding" in head.headers):
+        return False
+
+    part = -(-size // _RANGE_PARTS)
+    ranges = [(start, min(start + part, size) - 1)
+              for start in range(0, size, part)]
+    with open(filepath, "wb") as f:
+        fd = f.fileno()
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except (AttributeError, OSError):
+            f.truncate(size)
+        with ThreadPoolExecutor(max_workers=len(ranges)) as ex:
+            ok = all(ex.map(
+                partial(_fetch_range, url=url, fd=fd, pbar=pbar),
+                ranges
+            ))
+    return ok
+
+
+def _url_to_path(url: str) -> str:
+    """Resolve a file:// url to a plain filesystem path.
+    """
+    return url2pathname(url[len("file://"):])
+
+
+def _copy_local(url: str,
+                filepath: str,
+                pbar: tqdm[_T]) -> bytes:
+    """
+    Handle a file:// "download" (a LAN mirror mounted locally) as an
+    in-kernel copy. shutil.copyfile uses sendfile/copy_file_range
+    under the hood, so no byte passes through Python; the digest is
+    then taken from the copy with the mmap hasher.
+    """
+    src = _url_to_path(url)
+    shutil.copyfile(src, filepath)
+    pbar.update(os.path.getsize(filepath))
+    return default_hasher.get_sha256_hash(files=Path(filepath))[filepath]
+
+
 def download(url: str,
              filepath: str,
              pbar: tqdm[_T],
-             chunk_size: Optional[int] = None) -> None:
+             chunk_size: Optional[int] = None,
+             size: Optional[int] = None) -> bytes:
     """
-    Download from the provided url and save it to a file.
+    Download from the provided url and save it to a file, returning
+    the sha256 digest of the body.
+
+    The body is copied straight from the raw response with
+    shutil.copyfileobj, so the read/write loop runs in C instead of
+    one Python iteration per chunk. The digest is computed on the
+    bytes as they stream past, so verification never has to read the
+    file back from disk.
+
+    Files whose known size reaches 16 MiB are fetched as parallel
+    byte ranges instead, when the server supports them; their digest
+    is computed from the finished file since the ranges complete out
+    of order.
 
     Parameters
     ----------
     url : url to download the file from
-    filepath : path where to save file
-    pbar : tqdm progress bar that will be updated with each iteration
-    chunk_size : amount do download and save at once, default is 1024
+    filepath : path where to save file; the parent directory must
+        already exist (update_files creates them all in one pass)
+    pbar : tqdm progress bar that will be updated as data arrives
+    chunk_size : copy buffer size, default is 1 MiB
+    size : expected body size when known, used to pick the ranged path
+
+    Returns
+    -------
+    digest : raw sha256 digest of the downloaded body
     """
     if chunk_size is None:
-        chunk_size = 1024
+        chunk_size = 1 << 20
+
+    if url.startswith("file://"):
+        return _copy_local(url, filepath, pbar)
 
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    r = requests.get(url, stream=True,
+    if size is not None and size >= _RANGE_MIN_SIZE:
+        if _download_ranged(url=url, filepath=filepath,
+                            pbar=pbar, size=size):
+            digests = default_hasher.get_sha256_hash(files=Path(filepath))
+            return digests[filepath]
+        logging.debug(f"Server refused ranged download for {url}, "
+                      f"falling back to a single stream")
+
+    r = _SESSION.get(url, stream=True,
                      headers={'Cache-Control': 'no-cache'})
+    # Make urllib3 hand over decompressed data, like iter_content did.
+    r.raw.decode_content = True
+    hasher = hashlib.new("sha256")
     with open(filepath, "wb") as f:
-        for data in r.iter_content(chunk_size=chunk_size):
-            size = f.write(data)
-            pbar.update(size)
+        # Reserving the extents up front means one metadata update
+        # instead of an inode extension per write, and keeps large
+        # files contiguous on disk.
+        # With a content coding, Content-Length describes the encoded
+        # body, not the decoded bytes we write, so preallocating from
+        # it would leave the file padded past the real end.
+        length = int(r.headers.get("Content-Length", 0))
+        if length and "Content-Encoding" not in r.headers:
+            try:
+                os.posix_fallocate(f.fileno(), 0, length)
+            except (AttributeError, OSError):
+                pass
+        writer = _ProgressWriter(f, pbar, hasher=hasher)
+        shutil.copyfileobj(r.raw, writer, length=chunk_size)
+        writer.flush_progress()
+    return hasher.digest()
 
 
 def download_patch(patch_file: PatchFile,
                    pbar: tqdm[_T]
-                   ) -> None:
-    """Simple wrapper around download that unpacks a patch file.
+                   ) -> tuple[str, bytes]:
     """
-    download(
-        url=patch_file["full_url"],
-        filepath=str(patch_file["full_path"]),
-        pbar=pbar
+    Simple wrapper around download that unpacks a patch file and pairs
+    the resulting digest with the file's path.
+    """
+    digest = download(
+        url=patch_file.full_url,
+        filepath=patch_file.full_path_str,
+        pbar=pbar,
+        size=patch_file.size
     )
+    return patch_file.full_path_str, digest
 
 
-def read_patchlist(url: str) -> PatchFileList:
+def _parse_patchlist(lines: Iterable[bytes],
+                     root_dir: Path,
+                     url_root: str) -> PatchFileList:
+    """
+    Parse patch list lines into PatchFile objects, resolving the full
+    download url and output path of every file in the same pass.
+    """
+    patch_files: PatchFileList = []
+    for line in lines:
+        parts = line.split(b",")
+        if len(parts) != 3:
+            continue
+        # The fixup and split run as C-level bytes operations; only
+        # the path component actually needs decoding to text.
+        rel_url = parts[0].replace(b"\\", b"/").decode()
+        full_path = root_dir.joinpath(rel_url[1:])
+        patch_files.append(PatchFile(
+            path=Path(rel_url[1:]),
+            url=rel_url,
+            # Raw digests halve the memory per hash and compare with
+            # a single memcmp.
+            hash=bytes.fromhex(parts[1].decode()),
+            size=int(parts[2]),
+            full_path=full_path,
+            # Stringifying a Path is surprisingly expensive, so cache
+            # the result for all the lookups done later.
+            full_path_str=os.fspath(full_path),
+            full_url=url_root + rel_url
+        ))
+    return patch_files
+
+
+def read_patchlist(url: str,
+                   root_dir: Path,
+                   url_root: str,
+                   cache_dir: Optional[Path] = None) -> PatchFileList:
     """
     Download and parse a text file where every line corresponds to a
     PatchFile type object.
+
+    The response is streamed and parsed in a single pass instead of
+    materializing the full file plus intermediate lists in memory.
+
+    When a cache directory is given, the patch list and its ETag are
+    kept there and the request is made conditional, so an unchanged
+    list answers with an empty 304 instead of the full body.
+
+    Parameters
+    ----------
+    url : location of the patch file list
+    root_dir : local directory all output paths are resolved against
+    url_root : url prefix all download urls are resolved against
+    cache_dir : directory used to cache the list between runs
     """
-    r = requests.get(url)
-    patch_file_list = r.content.split(b"\n")
-    patch_file_list_parsed = [
-        i.decode().replace("\\", "/").split(",") for i in patch_file_list
-    ]
-    patch_file_list_parsed = [i for i in patch_file_list_parsed if len(i) == 3]
-    patch_files = []
-    for i in patch_file_list_parsed:
-        patch_file: PatchFile = {
-            "path": Path(i[0][1:]),
-            "url": i[0],
-            "hash": i[1],
-            "size": int(i[2])
-        }
-        patch_files.append(patch_file)
+    if url.startswith("file://"):
+        # A mounted mirror is read directly; the conditional-request
+        # cache below only pays off for real HTTP round trips.
+        return _parse_patchlist(
+            Path(_url_to_path(url)).read_bytes().split(b"\n"),
+            root_dir=root_dir,
+            url_root=url_root
+        )
+
+    cache_path, etag_path = None, None
+    headers = {}
+    if cache_dir is not None:
+        cache_path = cache_dir.joinpath("PatchFileList.txt")
+        etag_path = cache_dir.joinpath("PatchFileList.etag")
+        if cache_path.exists() and etag_path.exists():
+            headers["If-None-Match"] = etag_path.read_text()
+
+    r = _SESSION.get(url, stream=True, headers=headers)
+    if r.status_code != 304:
+        # An error page would otherwise parse as an empty patch list
+        # and look like there is simply nothing to download.
+        r.raise_for_status()
+    if r.status_code == 304 and cache_path is not None:
+        logging.info("Patch list unchanged since last run, using the "
+                     "cached copy")
+        return _parse_patchlist(cache_path.read_bytes().split(b"\n"),
+                                root_dir=root_dir,
+                                url_root=url_root)
+
+    raw_lines: list[bytes] = []
+
+    def _tee(lines: Iterable[bytes]) -> Iterator[bytes]:
+        for line in lines:
+            raw_lines.append(line)
+            yield line
+
+    source: Iterable[bytes] = r.iter_lines(chunk_size=64 * 1024)
+    if cache_path is not None:
+        source = _tee(source)
+    patch_files = _parse_patchlist(source,
+                                   root_dir=root_dir,
+                                   url_root=url_root)
+
+    if cache_path is not None and etag_path is not None:
+        etag = r.headers.get("ETag")
+        if etag:
+            cache_path.write_bytes(b"\n".join(raw_lines))
+            etag_path.write_text(etag)
+        elif etag_path.exists():
+            # The server stopped sending ETags, drop the stale cache.
+            etag_path.unlink()
     return patch_files
 
 
 def check_files(files: PatchFileList,
                 validate: bool,
-                hashes: Optional[HashDict] = None
-                ) -> tuple[PatchFileList, HashDict]:
+                hashes: Optional[HashEntryDict] = None
+                ) -> tuple[PatchFileList, HashEntryDict]:
     """
     Compare hashes stored within the PatchFile objects with the provided
     hashes dictionary. If any of the hashes don't match, that file is
     marked as invalid and returned.
 
-    If validate is passed, the hashes variable is completely
-    recalculated for every file present in files.
+    If validate is passed, the hashes variable is recalculated for
+    every file present in files, except for files whose size and
+    mtime still match the cached entry from the last local hashing
+    run; those are trusted without re-reading them.
 
     Parameters
     ----------
@@ -129,49 +438,121 @@ def check_files(files: PatchFileList,
         hashes = {}
 
     invalid = []
-    hasher = Hashing()
+    # Scan each unique directory once with scandir instead of statting
+    # every file by its full path: missing files fall out of the
+    # directory listing for free, and entry.stat resolves relative to
+    # the already-open directory instead of walking the whole path.
+    # The results double as the freshness check for the hash cache
+    # below, so keep them around.
+    stats: dict[str, os.stat_result] = {}
+    for directory in {os.path.dirname(f.full_path_str) for f in files}:
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stats[entry.path] = entry.stat()
+        except FileNotFoundError:
+            continue
     for file in files:
-        if not file["full_path"].exists():
-            logging.debug(f"{file['full_path']} not found on disk")
+        stat = stats.get(file.full_path_str)
+        if stat is None:
+            logging.debug("%s not found on disk", file.full_path)
             invalid.append(file)
-        elif os.path.getsize(file["full_path"]) != file["size"]:
-            logging.debug(f"{file['full_path']} has incorrect size")
+            continue
+        if stat.st_size != file.size:
+            logging.debug("%s has incorrect size", file.full_path)
             invalid.append(file)
+    # Guards against marking a file invalid twice: a wrong-size file
+    # usually has a mismatched hash too, and a duplicate entry would
+    # make update_invalid_files download it twice.
+    invalid_ids = {id(i) for i in invalid}
 
     if validate:
         logging.info("Recalculating all local hashes")
-        hashes = hasher.get_sha256_hash(
-            files=[i["full_path"] for i in files if i not in invalid]
+        new_hashes: HashEntryDict = {}
+        to_hash = []
+        for i in files:
+            if id(i) in invalid_ids:
+                continue
+            key = i.full_path_str
+            cached = hashes.get(key)
+            stat = stats[key]
+            if (cached is not None
+                    and cached["size"] == stat.st_size
+                    and cached["mtime_ns"] == stat.st_mtime_ns):
+                # The file hasn't changed since it was last hashed
+                # locally, so the cached hash is still good and the
+                # whole-file read can be skipped.
+                new_hashes[key] = cached
+            else:
+                to_hash.append(i)
+        # Hash the biggest files first so the worker pool doesn't end
+        # the batch with one straggler crunching a huge file alone.
+        to_hash.sort(key=lambda f: f.size, reverse=True)
+        digests = default_hasher.get_sha256_hash(
+            files=[i.full_path for i in to_hash]
         )
-    # If new PatchFiles are present, add them to the hash list.
+        for key, sha in digests.items():
+            stat = stats[key]
+            new_hashes[key] = {
+                "sha": sha,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns
+            }
+        hashes = new_hashes
+    # If new PatchFiles are present, add them to the hash list. Their
+    # hash comes from the patch list, not from reading the local file,
+    # so mtime_ns 0 keeps them out of the re-hash shortcut.
     for i in files:
-        if str(i["full_path"]) not in hashes:
-            hashes[str(i["full_path"])] = i["hash"]
-
-    # If the cached hash doesn't match the PatchFile hash, mark as invalid.
-    for file in files:
-        if hashes[str(file["full_path"])] != file["hash"]:
-            invalid.append(file)
+        if i.full_path_str not in hashes:
+            hashes[i.full_path_str] = {
+                "sha": i.hash,
+                "size": i.size,
+                "mtime_ns": 0
+            }
+
+    # If the cached hash doesn't match the PatchFile hash, mark as
+    # invalid. map pulls the cached values out through the C layer so
+    # the per-file work is just one digest comparison.
+    cached_entries = map(hashes.__getitem__,
+                         [f.full_path_str for f in files])
+    invalid.extend(
+        file for file, entry in zip(files, cached_entries)
+        if entry["sha"] != file.hash and id(file) not in invalid_ids
+    )
 
     return invalid, hashes
 
 
-def calc_full_paths(root_dir: Path, files: PatchFileList) -> None:
-    for file in files:
-        file["full_path"] = root_dir.joinpath(file["path"])
-
-
-def calc_full_urls(url_root: str, files: PatchFileList) -> None:
-    for file in files:
-        file["full_url"] = url_root + file["url"]
-
-
-def update_files(files: PatchFileList) -> None:
+def update_files(files: PatchFileList,
+                 max_workers: Optional[int] = None) -> HashDict:
     """
     Download files from a list of PatchFile objects.
     Uses multiple threads to speed up the download (in some cases).
+
+    Parameters
+    ----------
+    files : the files to download
+    max_workers : number of concurrent downloads, defaults to 16
+
+    Returns
+    -------
+    digests : the sha256 digest of every downloaded body, keyed by the
+        file's full path
     """
-    total = sum([i["size"] for i in files])
+    if max_workers is None:
+        max_workers = _DOWNLOAD_WORKERS
+
+    # Create every output directory up front; patch files cluster in
+    # few directories, so deduplicating through a set leaves only a
+    # handful of syscalls instead of one makedirs per download.
+    for directory in {os.path.dirname(i.full_path_str) for i in files}:
+        os.makedirs(directory, exist_ok=True)
+
+    total = sum(i.size for i in files)
+    # Largest files first: with longest-job-first scheduling no worker
+    # is left crunching a huge file alone after the rest finish.
+    files = sorted(files, key=lambda f: f.size, reverse=True)
     pbar = tqdm(
         position=0,
         total=total,
@@ -179,26 +560,54 @@ def update_files(files: PatchFileList) -> None:
         unit_scale=True,
         unit_divisor=1024,
         desc="Downloading files",
-        smoothing=0.15
+        smoothing=0.15,
+        # Updates already arrive at most once per MiB per thread; this
+        # additionally caps terminal redraws, which take the shared
+        # tqdm lock.
+        mininterval=0.25
     )
-    with ThreadPool(4) as p:
-        p.map(partial(download_patch, pbar=pbar), files)
+    # Executor.map hands files out one at a time, so free threads keep
+    # pulling from the shared size-sorted queue.
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        return dict(ex.map(partial(download_patch, pbar=pbar), files))
 
 
-def remove_redundant_files(hashes: HashDict,
-                           patch_files: PatchFileList) -> Optional[list[str]]:
+def _try_unlink(file: str) -> bool:
+    """
+    Delete a single file, tolerating it already being gone. Relying on
+    the unlink error instead of a separate existence check saves a
+    stat per file.
+    """
+    try:
+        os.unlink(file)
+        return True
+    except FileNotFoundError:
+        logging.error("Asked to delete the following file: "
+                      "%s, but it does not exist. Continuing "
+                      "program execution anyway", file)
+        return False
+
+
+def remove_redundant_files(hashes: HashEntryDict,
+                           patch_path_set: frozenset[str]
+                           ) -> Optional[list[str]]:
     """
     Delete all files that exist in the hash dictionary but not in the
     patch list. Asks for confirmation if the number of files to delete is
     large.
 
+    Parameters
+    ----------
+    hashes : the local hash cache
+    patch_path_set : full paths of every file on the current patch
+        list, built once by the caller
+
     Returns
     -------
     deleted : A list of all files that have been deleted in the form of
         full filepaths.
     """
-    patch_files_str = [str(i["full_path"]) for i in patch_files]
-    delete_list = [h for h in hashes if h not in patch_files_str]
+    delete_list = [h for h in hashes if h not in patch_path_set]
 
     if delete_list:
         # In case the amount of files to delete is large, ask the user for
@@ -209,13 +618,10 @@ def remove_redundant_files(hashes: HashDict,
             if not confirm(question=question, default=False):
                 return None
 
-        for file in delete_list:
-            try:
-                Path(file).unlink()
-            except FileNotFoundError:
-                logging.error(f"Asked to delete the following file: "
-                              f"{file}, but it does not exist. Continuing "
-                              f"program execution anyway")
+        # Deletion is all syscall latency, so overlap the unlinks with
+        # a small thread pool.
+        with ThreadPool(8) as p:
+            p.map(_try_unlink, delete_list)
 
         logging.info(f"Removed {len(delete_list)} files that are no longer "
                      f"on the patch list")
@@ -226,38 +632,60 @@ def remove_redundant_files(hashes: HashDict,
 def check_maintenence(root_domain: str) -> bool:
     """Check whether the application is currently under maintenance.
     """
-    r = requests.get(root_domain + "/MaintenanceLock.lck")
+    # A mounted mirror signals maintenance the same way the server
+    # does: by the lock file existing.
+    if root_domain.startswith("file://"):
+        return os.path.exists(
+            os.path.join(_url_to_path(root_domain), "MaintenanceLock.lck")
+        )
+    # HEAD is enough to learn the status code and skips the body. The
+    # tight timeout keeps a hung server from stalling startup forever.
+    r = _SESSION.head(root_domain + "/MaintenanceLock.lck",
+                      timeout=(3, 5),
+                      allow_redirects=False)
     if r.status_code == 200:
         return True
     return False
 
 
-def update_invalid_files(invalid_patch_files: PatchFileList,
-                         patch_files: PatchFileList,
-                         patch_root: str) -> HashDict:
-    """Download updates for invalid files and check their hashes afterward.
+def update_invalid_files(
+        invalid_patch_files: PatchFileList,
+        max_workers: Optional[int] = None) -> HashEntryDict:
     """
-    hasher = Hashing()
-    calc_full_urls(url_root=patch_root, files=patch_files)
-    update_files(files=invalid_patch_files)
-    new_hashes = hasher.get_sha256_hash(
-        files=[i["full_path"] for i in invalid_patch_files]
-    )
+    Download updates for invalid files and check their hashes.
+
+    The digests fall out of the download stream itself, so no file is
+    read back from disk just to verify it.
+    """
+    new_digests = update_files(files=invalid_patch_files,
+                               max_workers=max_workers)
+    new_hashes: HashEntryDict = {}
     for i in invalid_patch_files:
-        if i["hash"] != new_hashes[str(i["full_path"])]:
-            logging.error(f"The hash of the downloaded file "
-                          f"{i['full_path']} does not match the hash "
-                          f"provided online. Continuing program execution "
-                          f"anyway")
+        key = i.full_path_str
+        if i.hash != new_digests[key]:
+            logging.error("The hash of the downloaded file "
+                          "%s does not match the hash "
+                          "provided online. Continuing program execution "
+                          "anyway", i.full_path)
+        # Record the stat of the freshly written file so the next
+        # validate run can trust it without re-hashing.
+        stat = os.stat(key)
+        new_hashes[key] = {
+            "sha": new_digests[key],
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns
+        }
     return new_hashes
 
 
 def main(root_domain: str,
          output_dir: str,
          validate: bool,
-         hashes: Optional[HashDict] = None,
-         remove_files: Optional[bool] = None
-         ) -> tuple[Optional[HashDict], Optional[HashDict]]:
+         hashes: Optional[HashEntryDict] = None,
+         remove_files: Optional[bool] = None,
+         cache_dir: Optional[Path] = None,
+         max_workers: Optional[int] = None
+         ) -> tuple[Optional[HashEntryDict], Optional[HashEntryDict]]:
     """
     The main module workflow. Responsible for just about everything.
 
@@ -269,47 +697,73 @@ def main(root_domain: str,
     hashes : hashes from previous runs, assumed to be correct
     remove_files : whether to remove files that are present in hashes
         but not on the current patch list
+    cache_dir : directory used to cache the patch list between runs
+    max_workers : number of concurrent downloads, defaults to 16
 
     Returns
     -------
-    new_files, deleted_files : If any new files were downloaded or if
-        any files were deleted, their paths and hashes are returned
+    hashes, deleted_files : the refreshed local hash cache, including
+        the digests and stats of anything downloaded this run, and, if
+        any files were deleted, their paths and old entries
     """
     if remove_files is None:
         remove_files = False
 
-    new_files, deleted_files = None, None
-
-    # Respect server maintenance. Downloading files before maintenance is
-    # over could result in a corrupt installation or even a ban since you're
-    # not supposed to be able to do it.
-    if check_maintenence(root_domain=root_domain):
-        logging.info("Servers are currently under maintenance, try again "
-                     "later")
-        return new_files, deleted_files
+    deleted_files = None
 
     output_dir_path = Path(output_dir)
     patch_root = root_domain + "/Patch"
     patch_file_list_location = "/PatchFileList.txt"
 
-    patch_files = read_patchlist(root_domain + patch_file_list_location)
-    calc_full_paths(output_dir_path, patch_files)
+    # The maintenance check and the patch list fetch are independent
+    # requests to the same host, so issue them concurrently and pay
+    # one round trip of startup latency instead of two.
+    with ThreadPool(1) as p:
+        patch_files_async = p.apply_async(read_patchlist, kwds={
+            "url": root_domain + patch_file_list_location,
+            "root_dir": output_dir_path,
+            "url_root": patch_root,
+            "cache_dir": cache_dir
+        })
+        # Respect server maintenance. Downloading files before
+        # maintenance is over could result in a corrupt installation
+        # or even a ban since you're not supposed to be able to do it.
+        under_maintenance = check_maintenence(root_domain=root_domain)
+        if under_maintenance:
+            logging.info("Servers are currently under maintenance, try "
+                         "again later")
+            # The patch list request is already in flight and quite
+            # likely erroring during a maintenance window; collect it
+            # so the pool winds down cleanly, but don't let its error
+            # mask the maintenance message.
+            try:
+                patch_files_async.get()
+            except Exception:
+                logging.debug("Patch list fetch failed during "
+                              "maintenance, ignoring", exc_info=True)
+            return hashes, deleted_files
+        patch_files = patch_files_async.get()
 
     invalid_patch_files, hashes = check_files(files=patch_files,
                                               hashes=hashes,
                                               validate=validate)
 
     if invalid_patch_files:
-        new_files = update_invalid_files(
-            patch_files=patch_files,
+        # Fold the download results into the refreshed cache so the
+        # caller persists one coherent dict: stats recorded during
+        # check_files for untouched files, fresh ones for downloads.
+        hashes.update(update_invalid_files(
             invalid_patch_files=invalid_patch_files,
-            patch_root=patch_root
-        )
+            max_workers=max_workers
+        ))
 
     if remove_files:
+        # Built once so membership checks are O(1) hash lookups on
+        # already-interned strings.
+        patch_path_set = frozenset(i.full_path_str for i in patch_files)
         deleted = remove_redundant_files(hashes=hashes,
-                                         patch_files=patch_files)
-        if deleted_files is not None:
+                                         patch_path_set=patch_path_set)
+        if deleted is not None:
             deleted_files = {i: hashes[i] for i in deleted}
 
-    return new_files, deleted_files
+    return hashes, deleted_files
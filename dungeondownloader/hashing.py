@@ -1,17 +1,93 @@
 import hashlib
-import logging
+import mmap
 import os
-import platform
-from functools import partial
-from multiprocessing.dummy import Pool
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from subprocess import Popen, PIPE
-from typing import Union
+from typing import BinaryIO, TypedDict, Union
 
 from tqdm import tqdm
 
-# This is useful as an import in other parts of the code
-HashDict = dict[str, str]
+# This is useful as an import in other parts of the code. Digests are
+# kept as raw 32-byte values in memory; comparing those is a single
+# memcmp and they take half the space of hex strings. They are only
+# rendered to hex at the config boundary.
+HashDict = dict[str, bytes]
+
+
+class HashEntry(TypedDict, total=True):
+    """
+    Everything cached about a single local file. size and mtime_ns
+    record the stat of the file at the moment it was last hashed
+    locally, which lets later runs skip re-hashing unchanged files.
+    Entries whose hash came from the patch list rather than from
+    hashing the local file carry mtime_ns 0 so they are never trusted
+    by that shortcut.
+    """
+    sha: bytes
+    size: int
+    mtime_ns: int
+
+
+# The full local hash cache, keyed by the stringified file path.
+HashEntryDict = dict[str, HashEntry]
+
+# Below this many files a worker pool costs more in startup than it
+# saves, so small batches are hashed serially.
+_PARALLEL_MIN_FILES = 32
+
+# Files larger than this are hashed in slices so a single mapping
+# doesn't blow the page cache.
+_MMAP_WHOLE_FILE_LIMIT = 256 << 20
+_MMAP_SLICE_SIZE = 64 << 20
+
+
+def _hash_readinto(f: BinaryIO, full_hash: "hashlib._Hash") -> None:
+    """
+    Stream a file into a hash object through a single reused 1 MiB
+    buffer. readinto fills the buffer in place, so no per-chunk bytes
+    object is allocated.
+    """
+    buf = bytearray(1 << 20)
+    view = memoryview(buf)
+    while n := f.readinto(buf):  # type: ignore[attr-defined]
+        full_hash.update(view[:n])
+
+
+def _hash_one(file: Path) -> tuple[str, bytes]:
+    """
+    Hash a single file with sha256 by mmapping it and feeding whole
+    memory regions to hashlib, which lets the OpenSSL backend process
+    the file in as few calls as possible. Files that can't be mmapped
+    (empty ones, exotic filesystems) are streamed through a reused
+    buffer instead.
+
+    Parameters
+    ----------
+    file : path of the file to hash
+
+    Returns
+    -------
+    path, hash : the stringified file path together with its raw digest
+    """
+    full_hash = hashlib.new("sha256")
+    with open(str(file), 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return str(file), full_hash.digest()
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            _hash_readinto(f, full_hash)
+            return str(file), full_hash.digest()
+        with mm:
+            if size <= _MMAP_WHOLE_FILE_LIMIT:
+                full_hash.update(mm)
+            else:
+                view = memoryview(mm)
+                for start in range(0, size, _MMAP_SLICE_SIZE):
+                    full_hash.update(view[start:start + _MMAP_SLICE_SIZE])
+                view.release()
+    return str(file), full_hash.digest()
 
 
 class Hashing:
@@ -20,12 +96,14 @@ class Hashing:
     def get_sha256_hash(self,
                         files: Union[list[Path], Path]) -> HashDict:
         """
-        Get the sha256 hash of a file. Attempts to use platform
-        specific utilities but falls back to pure Python if there is an
-        error.
+        Get the sha256 hash of a file, entirely in-process on every
+        platform.
 
-        Uses multithreading and number of processes equal to number of
-        CPU cores.
+        Large batches are spread over a thread pool with one worker
+        per CPU core; hashlib releases the GIL while digesting big
+        buffers, so threads scale like processes here without paying
+        for worker spawn and result pickling. Small batches are hashed
+        in the calling thread.
 
         Parameters
         ----------
@@ -39,54 +117,20 @@ class Hashing:
         if not isinstance(files, list):
             files = [files]
 
-        system = platform.system()
-        logging.debug(f"Identified {system} as platform when calculating "
-                      f"hashes")
-        try:
-            if system in ["Darwin", "Linux"]:
-                sh256_hash = self._sha256sum(files=files)
-
-            else:
-                sh256_hash = self._get_sha256_hash_generic(files=files)
-
-        except ChildProcessError:
-            sh256_hash = self._get_sha256_hash_generic(files=files)
+        if len(files) < _PARALLEL_MIN_FILES:
+            return dict(map(_hash_one, files))
 
-        return sh256_hash
-
-    @staticmethod
-    def _get_sha256_hash_generic(files: list[Path]) -> HashDict:
-        """
-        Native Python sha256 hash calculation implementation, should
-        work anywhere where Python works but is slow.
-        """
         hashes = {}
-        for i in files:
-            full_hash = hashlib.sha256()
-            with open(str(i), 'rb') as f:
-                while chunk := f.read(8192):
-                    full_hash.update(chunk)
-            hashes[str(i)] = full_hash.hexdigest()
-
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+            for path, file_hash in tqdm(
+                    pool.map(_hash_one, files),
+                    desc="Calculating file hashes",
+                    total=len(files)):
+                hashes[path] = file_hash
         return hashes
 
-    @staticmethod
-    def _sha256sum(files: list[Path]) -> HashDict:
-        """
-        Use the sha256sum command with multiple threads to quickly
-        calculate file hashes.
-        """
-        commands = [("sha256sum", str(i)) for i in files]
-        popen_wrap = partial(Popen, stdout=PIPE, stderr=PIPE)
-        results = {}
-        with Pool(os.cpu_count()) as pool:
-            for result in tqdm(pool.imap(popen_wrap, commands),
-                               desc="Calculating file hashes",
-                               total=len(commands)):
-                err = result.stderr.readlines()
-                if err:
-                    raise ChildProcessError("Running sha256sum returned a "
-                                            "non-zero exit code")
-                output = str(result.stdout.readlines()).split(" ", 1)
-                results[output[1][1:-4]] = output[0][3:]
-        return results
+
+# Shared instance for the rest of the package; Hashing is stateless
+# today, but a single instance means any state a future backend needs
+# (worker pools, native contexts) is set up once per process.
+default_hasher = Hashing()
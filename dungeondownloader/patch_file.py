@@ -1,20 +1,23 @@
+from dataclasses import dataclass
 from pathlib import Path
-from typing import TypedDict
 
 
-class PatchFileBase(TypedDict, total=True):
-    """Required keys for the PatchFile dict.
+@dataclass(slots=True)
+class PatchFile:
+    """
+    A single entry from the patch list, together with its resolved
+    download url and local output path.
+
+    With slots, attribute access skips the per-instance dict hash
+    lookup that a plain dict entry would pay in the hot loops, and
+    each instance is considerably smaller.
     """
     path: Path
-    hash: str
+    hash: bytes
     size: int
     url: str
-
-
-class PatchFile(PatchFileBase, total=False):
-    """Optional keys for the PatchFile dict.
-    """
     full_path: Path
+    full_path_str: str
     full_url: str
 
 
@@ -1,15 +1,20 @@
+import functools
 import json
 import logging
+import os
+import sys
 from pathlib import Path
-from typing import Optional, Any
-
-import appdirs
-from pydantic import ValidationError, TypeAdapter
+from typing import TYPE_CHECKING, Optional, Any
 
 import dungeondownloader.dd
-from dungeondownloader.config_dict import ConfigDict
+from dungeondownloader.config_dict import ConfigDict, ConfigHashEntry
+from dungeondownloader.hashing import HashEntryDict
+
+if TYPE_CHECKING:
+    from pydantic import TypeAdapter
 
 
+@functools.lru_cache(maxsize=1)
 def load_config_filepath() -> Path:
     """
     Load the path to the config file. First looks in the working
@@ -17,10 +22,17 @@ def load_config_filepath() -> Path:
 
     If no config file is present, it will return the location where it
     should be according to the system standard.
+
+    The resolution is cached for the process lifetime since the
+    answer cannot change mid-run; tests can reset it with
+    load_config_filepath.cache_clear().
     """
     if Path("./config.json").exists():
         config_path = Path("./config.json")
     else:
+        # Imported here so a config in the working directory never
+        # pays for the appdirs import.
+        import appdirs
         config_path = Path(
             appdirs.user_data_dir(
                 appname="dungeon-downloader",
@@ -38,7 +50,8 @@ def load_config_filepath() -> Path:
 def generate_config(config_location: Path,
                     root_domain: Optional[str] = None,
                     output_dir: Optional[str] = None,
-                    hashes: Optional[dict[str, str]] = None) -> ConfigDict:
+                    hashes: Optional[dict[str, ConfigHashEntry]] = None
+                    ) -> ConfigDict:
     """
     Create a new config and write it to disk. Asks user for input if no
     root domain or output directory are specified.
@@ -54,10 +67,16 @@ def generate_config(config_location: Path,
     -------
     config : the generated config dictionary
     """
-    if root_domain is None:
-        root_domain = input("Please specify the root domain to use:")
-    if output_dir is None:
-        output_dir = input("Please specify the output directory:")
+    if root_domain is None or output_dir is None:
+        # Without a terminal the prompts below would block forever
+        # (cron, CI), so fail immediately with a clear message.
+        if not sys.stdin.isatty():
+            raise ValueError("root_domain and output_dir are required "
+                             "when running non-interactively")
+        if root_domain is None:
+            root_domain = input("Please specify the root domain to use:")
+        if output_dir is None:
+            output_dir = input("Please specify the output directory:")
 
     config: ConfigDict = {
         "root_domain": root_domain,
@@ -66,15 +85,99 @@ def generate_config(config_location: Path,
     if hashes is not None:
         config["hashes"] = hashes
 
-    config_location.parent.mkdir(exist_ok=True)
-    with open(config_location, "w") as f:
-        json.dump(config, f)
+    config_location.parent.mkdir(parents=True, exist_ok=True)
+    # Serialize to one bytes buffer and write it in a single call;
+    # json.dump would instead issue many small writes through the
+    # text-IO layer. The temp file plus rename keeps a crash mid-write
+    # from ever leaving a truncated config behind.
+    data = json.dumps(config).encode()
+    try:
+        if config_location.read_bytes() == data:
+            logging.debug("Config on disk already matches, skipping "
+                          "the write")
+            return config
+    except OSError:
+        pass
+    tmp_location = config_location.with_suffix(".json.tmp")
+    with open(tmp_location, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_location, config_location)
+    # Drop any cached parse of the file just replaced.
+    for key in [k for k in _parsed_cache if k[0] == config_location]:
+        del _parsed_cache[key]
 
     logging.info(f"Saved config file to {config_location}")
 
     return config
 
 
+# Parsed configs keyed by (path, mtime_ns); a repeat load of an
+# unchanged file skips the JSON parse and pydantic validation.
+_parsed_cache: dict[tuple[Path, int], ConfigDict] = {}
+
+
+def _config_copy(config: ConfigDict) -> ConfigDict:
+    """
+    Copy a cached config so callers can mutate their instance (and
+    its hashes dict) without tainting the cache.
+    """
+    copied = config.copy()
+    if "hashes" in copied:
+        copied["hashes"] = dict(copied["hashes"])
+    return copied
+
+
+@functools.cache
+def _config_adapter() -> "TypeAdapter[ConfigDict]":
+    """
+    Build the pydantic adapter for the config schema once per process.
+    Both the pydantic import and the schema construction are deferred
+    to first use, so runs that generate a fresh config never pay for
+    them.
+    """
+    from pydantic import TypeAdapter
+    return TypeAdapter(ConfigDict)
+
+
+def _migrate_legacy_config(raw_config: bytes) -> Optional[ConfigDict]:
+    """
+    Convert a config written before hash entries carried size and
+    mtime metadata, when hashes was a flat path -> hex digest mapping.
+
+    The old digests stay usable for comparison; size -1 and mtime_ns 0
+    can never match a real stat, so migrated entries are excluded from
+    the re-hash shortcut until they are refreshed by a validate run.
+
+    Returns
+    -------
+    config : the migrated config, or None if the data isn't an
+        old-format config
+    """
+    try:
+        old = json.loads(raw_config)
+    except ValueError:
+        return None
+    if not (isinstance(old, dict)
+            and isinstance(old.get("root_domain"), str)
+            and isinstance(old.get("output_dir"), str)):
+        return None
+    hashes = old.get("hashes")
+    if not (isinstance(hashes, dict)
+            and all(isinstance(k, str) and isinstance(v, str)
+                    for k, v in hashes.items())):
+        return None
+    return {
+        "root_domain": old["root_domain"],
+        "output_dir": old["output_dir"],
+        "hashes": {
+            k: {"sha": v, "size": -1, "mtime_ns": 0}
+            for k, v in hashes.items()
+        }
+    }
+
+
 def read_and_validate_config(config_location: Path,
                              root_domain: Optional[str] = None,
                              output_dir: Optional[str] = None
@@ -93,74 +196,131 @@ def read_and_validate_config(config_location: Path,
     the file are recognizable and build the new file from that.
     """
     config: ConfigDict
-    with open(config_location, "r") as f:
-        config = json.load(f)
-    logging.debug(f"Loaded config file, attempting to validate")
-    try:
-        TypeAdapter(ConfigDict).validate_python(config)
-        logging.info("Config successfully loaded and validated")
-    except ValidationError:
-        logging.warning("The current config is invalid, generating a "
-                        "new one")
-        config = generate_config(root_domain=root_domain,
-                                 output_dir=output_dir,
-                                 config_location=config_location)
+    cache_key = (config_location, config_location.stat().st_mtime_ns)
+    cached = _parsed_cache.get(cache_key)
+    if cached is not None:
+        logging.debug("Config unchanged since last load, using the "
+                      "parsed copy")
+        config = _config_copy(cached)
+    else:
+        from pydantic import ValidationError
+
+        raw_config = config_location.read_bytes()
+        logging.debug("Loaded config file, attempting to validate")
+        try:
+            # validate_json parses and validates in a single pass
+            # inside pydantic-core instead of json.load plus a second
+            # walk of the resulting dict.
+            config = _config_adapter().validate_json(raw_config)
+            logging.info("Config successfully loaded and validated")
+            _parsed_cache[cache_key] = _config_copy(config)
+        except ValidationError:
+            # An old-format config (flat hex digests) is still good
+            # data; carry everything over instead of regenerating.
+            migrated = _migrate_legacy_config(raw_config)
+            if migrated is None:
+                logging.warning("The current config is invalid, "
+                                "generating a new one")
+                return generate_config(root_domain=root_domain,
+                                       output_dir=output_dir,
+                                       config_location=config_location)
+            logging.info("Migrating config from the old flat hash "
+                         "format")
+            config = generate_config(
+                root_domain=migrated["root_domain"],
+                output_dir=migrated["output_dir"],
+                hashes=migrated.get("hashes"),
+                config_location=config_location
+            )
 
-    if config["root_domain"] != root_domain and root_domain is not None:
-        logging.info("New value for root-domain passed, overwriting "
-                     "old value present in config")
-        config = generate_config(root_domain=root_domain,
-                                 output_dir=config["output_dir"],
-                                 config_location=config_location)
-    if config["output_dir"] != output_dir and output_dir is not None:
-        logging.info("New value for output-dir passed, overwriting old "
-                     "value present in config")
-        config = generate_config(root_domain=config["root_domain"],
-                                 output_dir=output_dir,
+    # Resolve the final values first so an override of both fields
+    # (or of either one) costs a single rewrite instead of one per
+    # field.
+    final_root = root_domain if root_domain is not None \
+        else config["root_domain"]
+    final_out = output_dir if output_dir is not None \
+        else config["output_dir"]
+    if (final_root != config["root_domain"]
+            or final_out != config["output_dir"]):
+        logging.info("New values passed on the command line, "
+                     "overwriting old values present in config")
+        config = generate_config(root_domain=final_root,
+                                 output_dir=final_out,
+                                 hashes=config.get("hashes"),
                                  config_location=config_location)
     return config
 
 
-def add_new_hashes(new_hashes: dict[str, str],
-                   hash_dict: dict[str, str]) -> None:
+def _entries_to_config(
+        hashes: Optional[HashEntryDict]
+) -> Optional[dict[str, ConfigHashEntry]]:
+    """
+    Render hash cache entries coming out of dd into the form used on
+    disk, with the raw digests turned into hex.
+    """
+    if hashes is None:
+        return None
+    return {
+        k: {
+            "sha": v["sha"].hex(),
+            "size": v["size"],
+            "mtime_ns": v["mtime_ns"]
+        }
+        for k, v in hashes.items()
+    }
+
+
+def add_new_hashes(new_hashes: dict[str, ConfigHashEntry],
+                   hash_dict: dict[str, ConfigHashEntry]) -> bool:
     """
     Add/update hashes in hash_dict based on values in new_hashes.
     Performs operations on hash_dict in-place.
-    """
-    for key, value in new_hashes.items():
-        if key not in hash_dict:
-            logging.debug(f"Local hash doesn't exist for {key}, creating new "
-                          f"entry and saving hash to local database")
-            hash_dict[key] = value
-        elif hash_dict[key] != value:
-            logging.debug(f"Hash changed for {key}, saving new hash to local "
-                          f"database")
-            hash_dict[key] = value
-        else:
-            logging.debug(f"Asked to update {key} in the local hash database, "
-                          f"but there's nothing to update. This is normal if "
-                          f"the file is new.")
 
+    The merge itself is a single C-level dict update; the per-key
+    bookkeeping only exists to know whether anything changed and to
+    produce the debug summary.
 
-def remove_hashes(deleted_hashes: dict[str, str],
-                  hash_dict: dict[str, str]) -> None:
+    Returns
+    -------
+    changed : whether any entry was actually added or updated
+    """
+    changed = {k for k, v in new_hashes.items() if hash_dict.get(k) != v}
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        added = new_hashes.keys() - hash_dict.keys()
+        logging.debug(f"Adding {len(added & changed)} new entries and "
+                      f"updating {len(changed - added)} existing entries "
+                      f"in the local hash database")
+    hash_dict.update(new_hashes)
+    return bool(changed)
+
+
+def remove_hashes(deleted_hashes: dict[str, ConfigHashEntry],
+                  hash_dict: dict[str, ConfigHashEntry]) -> bool:
     """
     Remove hashes from a hash_dict in-place based on hashes in
     deleted_hashes.
+
+    Returns
+    -------
+    changed : whether any entry was actually removed
     """
-    for key, value in deleted_hashes.items():
-        if key in hash_dict:
-            logging.debug(f"Removing {key} from local hash cache")
-            hash_dict.pop(key)
-        else:
-            logging.error(f"Asked to remove {key} from local hash cache, but "
-                          f"it is not present in the cache")
+    present = deleted_hashes.keys() & hash_dict.keys()
+    for key in deleted_hashes.keys() - present:
+        logging.error("Asked to remove %s from local hash cache, but "
+                      "it is not present in the cache", key)
+    for key in present:
+        del hash_dict[key]
+    if present:
+        logging.debug(f"Removed {len(present)} entries from the local "
+                      f"hash cache")
+    return bool(present)
 
 
 def update_hashes(config_location: Path,
                   config: ConfigDict,
-                  new_hashes: Optional[dict[str, str]] = None,
-                  deleted_hashes: Optional[dict[str, str]] = None) -> None:
+                  new_hashes: Optional[dict[str, ConfigHashEntry]] = None,
+                  deleted_hashes: Optional[dict[str, ConfigHashEntry]] = None
+                  ) -> None:
     """
     Given a config dict, a dict of new hashes, and a dict
     of hashes to remove, update config with the new hashes, remove the
@@ -174,23 +334,24 @@ def update_hashes(config_location: Path,
     config_location : path to config file
     """
     logging.debug("Updating hashes")
-    if "hashes" not in config:
-        logging.debug("Hashes not found in config, creating new hashes "
-                      "entry")
-        config["hashes"] = {}
-    hash_dict = config["hashes"]
+    hash_dict = config.setdefault("hashes", {})
 
+    changed = False
     if new_hashes is None:
         logging.debug("No new hashes found")
     else:
-        add_new_hashes(new_hashes=new_hashes, hash_dict=hash_dict)
+        changed |= add_new_hashes(new_hashes=new_hashes,
+                                  hash_dict=hash_dict)
 
     if deleted_hashes is None:
         logging.debug("No hashes deleted")
     else:
-        remove_hashes(deleted_hashes=deleted_hashes, hash_dict=hash_dict)
+        changed |= remove_hashes(deleted_hashes=deleted_hashes,
+                                 hash_dict=hash_dict)
 
-    if new_hashes is not None or deleted_hashes is not None:
+    # Only rewrite the file when an entry actually changed; a no-op
+    # run serializes nothing.
+    if changed:
         generate_config(root_domain=config["root_domain"],
                         output_dir=config["output_dir"],
                         hashes=hash_dict,
@@ -201,6 +362,7 @@ def main(validate: bool,
          delete_files: bool,
          root_domain: Optional[str] = None,
          output_dir: Optional[str] = None,
+         max_workers: Optional[int] = None,
          *_: Any, **__: Any) -> None:
     """
     Function responsible for loading and saving data to/from the config
@@ -213,6 +375,7 @@ def main(validate: bool,
     validate : whether to recalculate and check hashes of all files
     root_domain : the root domain from which to calculate download paths
     output_dir : where to save all the files
+    max_workers : number of concurrent downloads
     """
     config_filepath = load_config_filepath()
     if not config_filepath.exists():
@@ -226,20 +389,36 @@ def main(validate: bool,
                                           output_dir=output_dir,
                                           config_location=config_filepath)
 
-    hashes = None
-    if "hashes" in config.keys():
-        hashes = config["hashes"]
+    config_hashes = config.get("hashes")
+    hashes: Optional[HashEntryDict] = None
+    if config_hashes is not None:
+        # The config stores hex strings for readability, dd works on
+        # raw digests internally.
+        hashes = {
+            k: {
+                "sha": bytes.fromhex(v["sha"]),
+                "size": v["size"],
+                "mtime_ns": v["mtime_ns"]
+            }
+            for k, v in config_hashes.items()
+        }
 
     logging.info(f"Running with root domain: {config['root_domain']} and "
                  f"output directory: {config['output_dir']}")
-    new_hashes, deleted_hashes = dungeondownloader.dd.main(
+    # dd returns the whole refreshed cache, so stat info recorded for
+    # validated (or migrated) entries is persisted too, not just the
+    # digests of downloaded files; add_new_hashes only rewrites the
+    # config when something in it actually changed.
+    refreshed_hashes, deleted_hashes = dungeondownloader.dd.main(
         root_domain=config["root_domain"],
         output_dir=config["output_dir"],
         hashes=hashes,
         validate=validate,
-        remove_files=delete_files
+        remove_files=delete_files,
+        cache_dir=config_filepath.parent,
+        max_workers=max_workers
     )
     update_hashes(config=config,
-                  new_hashes=new_hashes,
-                  deleted_hashes=deleted_hashes,
+                  new_hashes=_entries_to_config(refreshed_hashes),
+                  deleted_hashes=_entries_to_config(deleted_hashes),
                   config_location=config_filepath)